@@ -1,99 +1,155 @@
 #!/usr/bin/env python3
 import os
 import sys
-import html
+import io
 import re
 from pathlib import Path
 
+_LOSS_RE = re.compile(r"loss\s+(\d+(?:\.\d+)?)\s*%")
+_LAT_RE = re.compile(r"latency\s+(\d+)\s*ms")
+_TOPO_NAME_RE = re.compile(r'^topology-(\d+)$')
+_MS_RE = re.compile(r"(\d+)\s*ms")
+_DASH_CELL_RE = re.compile(r"^-{1,}\s*$")
+
+# a markdown separator row such as |---|:---:| only contains these characters
+_SEP_CHARS = frozenset("-|: \t")
+
+# extensions (without the dot) of files listed per topology; .svg is never listed
+_LOG_SUFFIXES = frozenset({"log", "txt", "md"})
+_SKIP_NAMES = frozenset({"topology_description.txt"})
+
+# same mapping as html.escape(s, quote=True), applied in a single pass
+_HTML_ESCAPE_TABLE = str.maketrans({
+    "&": "&amp;",
+    "<": "&lt;",
+    ">": "&gt;",
+    '"': "&quot;",
+    "'": "&#x27;",
+})
+
 
 def build_topology_map(tops):
     """
     Build map: (loss_float, latency_int) -> topology_num (string)
     reads topology_description.txt under each topology dir.
+
+    Also returns per-topology metadata keyed by directory name:
+    {'desc', 'display'}, so each description is read only once.
+    tops is the list of (name, path, desc_path) tuples from collect_topologies().
     """
     topo_map = {}
-    for t in tops:
-        desc_file = t / "topology_description.txt"
-        if not desc_file.exists():
+    topo_meta = {}
+    for name, _, desc_path in tops:
+        m = _TOPO_NAME_RE.match(name)
+        num = m.group(1) if m else None
+        # a missing description reads as empty
+        desc = read_text_file(desc_path)
+        topo_meta[name] = {
+            'desc': desc,
+            'display': f"{num}. topology" if num is not None else name,
+        }
+        if num is None or not desc:
             continue
-        desc = desc_file.read_text(encoding="utf-8")
         # find loss (e.g. loss 2% or loss 2.0%)
-        m_loss = re.search(r"loss\s+(\d+(?:\.\d+)?)\s*%", desc)
-        m_lat = re.search(r"latency\s+(\d+)\s*ms", desc)
-        if not m_loss or not m_lat:
+        m_loss = _LOSS_RE.search(desc)
+        if not m_loss:
+            continue
+        m_lat = _LAT_RE.search(desc)
+        if not m_lat:
             continue
         loss = float(m_loss.group(1))
         # normalize loss to one decimal to match table like "2.0%"
         loss_norm = round(loss, 1)
         lat = int(m_lat.group(1))
-        m = re.match(r'^topology-(\d+)$', t.name)
-        if m:
-            topo_map[(loss_norm, lat)] = m.group(1)
-    return topo_map
+        topo_map[(loss_norm, lat)] = num
+    return topo_map, topo_meta
+
+
+def _parse_loss_cell(txt: str):
+    """Parse a loss cell like '2%', '2.0 %' into a float rounded to one decimal, or None."""
+    idx = txt.find("%")
+    if idx <= 0:
+        return None
+    num = txt[:idx].rstrip()
+    whole, dot, frac = num.partition(".")
+    if not whole.isdecimal() or (dot and not frac.isdecimal()):
+        return None
+    return round(float(num), 1)
 
 
-def render_throughput_table(md: str, topo_map):
+def render_throughput_table(md: str, topo_map, out):
     """
-    Parse the markdown throughput tables (one per protocol) and render HTML.
+    Parse the markdown throughput tables (one per protocol) and write HTML to out.
     The markdown may contain headings (### protocol_name) followed by tables.
     Link each numeric cell to corresponding topology anchor if found.
     """
     sections = split_md_sections(md)
     if not sections:
-        return "<pre>{}</pre>".format(html.escape(md))
+        out.write(f"<pre>{md.translate(_HTML_ESCAPE_TABLE)}</pre>\n")
+        return
 
-    html_parts = []
     for title, table_md in sections:
         if title:
-            html_parts.append(f"<h3>{html.escape(title)}</h3>")
-        lines = [ln.strip() for ln in table_md.splitlines() if ln.strip()]
+            out.write(f"<h3>{title.translate(_HTML_ESCAPE_TABLE)}</h3>\n")
+        lines = [s for ln in table_md.splitlines() if (s := ln.strip())]
         table_lines = [ln for ln in lines if ln.startswith("|")]
         if not table_lines:
-            html_parts.append("<pre>{}</pre>".format(html.escape(table_md)))
+            out.write(f"<pre>{table_md.translate(_HTML_ESCAPE_TABLE)}</pre>\n")
             continue
 
-        header = [c.strip() for c in table_lines[0].strip().strip("|").split("|")]
+        header = [c.strip() for c in table_lines[0].strip("|").split("|")]
         latencies = []
         for h in header[1:]:
-            m = re.match(r"(\d+)\s*ms", h)
+            m = _MS_RE.match(h)
             latencies.append(int(m.group(1)) if m else None)
 
         data_rows = []
         for ln in table_lines[1:]:
-            if re.match(r'^\|\s*-+', ln):  # separator row
+            if "-" in ln and set(ln) <= _SEP_CHARS:  # separator row
                 continue
-            cols = [c.strip() for c in ln.strip().strip("|").split("|")]
+            # lines are already whitespace-stripped, only the outer pipes remain
+            cols = [c.strip() for c in ln.strip("|").split("|")]
             data_rows.append(cols)
 
-        html_t = ["<table>"]
-        html_t.append("<thead><tr>")
-        for col in header:
-            html_t.append(f"<th>{html.escape(col)}</th>")
-        html_t.append("</tr></thead>")
-        html_t.append("<tbody>")
+        out.write("<table>\n")
+        escaped_header = [col.translate(_HTML_ESCAPE_TABLE) for col in header]
+        out.write("<thead><tr>\n")
+        for col in escaped_header:
+            out.write(f"<th>{col}</th>\n")
+        out.write("</tr></thead>\n")
+        out.write("<tbody>\n")
+        if not topo_map:
+            # nothing to link to: skip loss parsing and lookups entirely
+            for row in data_rows:
+                if not row:
+                    continue
+                out.write("<tr>\n")
+                for cell in row:
+                    out.write(f"<td>{cell.translate(_HTML_ESCAPE_TABLE)}</td>\n")
+                out.write("</tr>\n")
+            out.write("</tbody></table>\n")
+            continue
+
+        topo_get = topo_map.get
         for row in data_rows:
             if not row:
                 continue
             loss_txt = row[0]
-            m_loss = re.match(r'(\d+(?:\.\d+)?)\s*%', loss_txt)
-            loss_val = round(float(m_loss.group(1)), 1) if m_loss else None
-            html_t.append("<tr>")
-            html_t.append(f"<td>{html.escape(loss_txt)}</td>")
+            loss_val = _parse_loss_cell(loss_txt)
+            out.write("<tr>\n")
+            out.write(f"<td>{loss_txt.translate(_HTML_ESCAPE_TABLE)}</td>\n")
             for i, cell in enumerate(row[1:]):
                 lat = latencies[i] if i < len(latencies) else None
-                link_html = html.escape(cell)
+                esc = cell.translate(_HTML_ESCAPE_TABLE)
+                topo_num = None
                 if loss_val is not None and lat is not None:
-                    key = (loss_val, lat)
-                    topo_num = topo_map.get(key)
-                    if topo_num is not None:
-                        anchor = f"topology-{topo_num}"
-                        link_html = f"<a href='#{anchor}'>{html.escape(cell)}</a>"
-                html_t.append(f"<td>{link_html}</td>")
-            html_t.append("</tr>")
-        html_t.append("</tbody></table>")
-        html_parts.append("\n".join(html_t))
-
-    return "\n".join(html_parts)
+                    topo_num = topo_get((loss_val, lat))
+                if topo_num is not None:
+                    out.write(f"<td><a href='#topology-{topo_num}'>{esc}</a></td>\n")
+                else:
+                    out.write(f"<td>{esc}</td>\n")
+            out.write("</tr>\n")
+        out.write("</tbody></table>\n")
 
 
 def split_md_sections(md: str):
@@ -121,9 +177,9 @@ def split_md_sections(md: str):
     return sections
 
 
-def md_table_to_html(md: str) -> str:
+def md_table_to_html(md: str, out):
     """
-    Convert the first Markdown table in md to an HTML table.
+    Convert the first Markdown table in md to an HTML table written to out.
     Simple implementation: lines starting with '|' are considered table rows.
     The separator row (|---|) is used to mark header/body split.
     """
@@ -131,93 +187,113 @@ def md_table_to_html(md: str) -> str:
     table_lines = []
     start = None
     for i, L in enumerate(lines):
-        if L.strip().startswith("|"):
+        stripped = L.strip()
+        if stripped.startswith("|"):
             if start is None:
                 start = i
-            table_lines.append(L.rstrip())
+            table_lines.append(stripped)
         elif start is not None:
             break
     if not table_lines:
-        return "<pre>{}</pre>".format(html.escape(md))
+        out.write(f"<pre>{md.translate(_HTML_ESCAPE_TABLE)}</pre>\n")
+        return
 
     # normalize rows: remove leading/trailing '|', split by '|' and strip cells
     rows = []
     for L in table_lines:
-        parts = [c.strip() for c in L.strip().strip("|").split("|")]
+        parts = [c.strip() for c in L.strip("|").split("|")]
         rows.append(parts)
 
     # find separator row index (---)
     sep_idx = None
     for i, row in enumerate(rows):
-        if all(re.match(r"^-{1,}\s*$", cell) for cell in row):
+        if all(_DASH_CELL_RE.match(cell) for cell in row):
             sep_idx = i
             break
 
-    html_table = ["<table>"]
-    if sep_idx is None:
-        # treat first row as header if no separator
-        header = rows[0]
-        html_table.append(
-            "<thead><tr>{}</tr></thead>".format("".join(f"<th>{html.escape(h)}</th>" for h in header)))
-        body_rows = rows[1:]
-    else:
-        header = rows[0]
-        html_table.append(
-            "<thead><tr>{}</tr></thead>".format("".join(f"<th>{html.escape(h)}</th>" for h in header)))
-        body_rows = rows[sep_idx + 1:]
-
-    html_table.append("<tbody>")
-    for r in body_rows:
-        html_table.append(
-            "<tr>{}</tr>".format("".join(f"<td>{html.escape(cell)}</td>" for cell in r)))
-    html_table.append("</tbody></table>")
-    return "\n".join(html_table)
-
+    out.write("<table>\n")
+    # treat first row as header; without a separator the body starts right after it
+    header = rows[0]
+    out.write("<thead><tr>")
+    out.write("".join([f"<th>{h.translate(_HTML_ESCAPE_TABLE)}</th>" for h in header]))
+    out.write("</tr></thead>\n")
+    body_rows = rows[1:] if sep_idx is None else rows[sep_idx + 1:]
 
-def collect_topologies(base: Path):
-    tops = []
-    for entry in sorted(base.iterdir()):
-        if entry.is_dir() and entry.name.startswith("topology-"):
-            tops.append(entry)
+    out.write("<tbody>\n")
+    for r in body_rows:
+        out.write("<tr>")
+        out.write("".join([f"<td>{cell.translate(_HTML_ESCAPE_TABLE)}</td>" for cell in r]))
+        out.write("</tr>\n")
+    out.write("</tbody></table>\n")
+
+
+def collect_topologies(base: str):
+    """Return sorted (name, path, desc_path) tuples for the topology-* dirs under base."""
+    with os.scandir(base) as it:
+        tops = [(e.name, e.path, os.path.join(e.path, "topology_description.txt"))
+                for e in it if e.name.startswith("topology-") and e.is_dir()]
+    tops.sort()
     return tops
 
 
-def read_text_file(p: Path):
+def read_text_file(p):
     try:
-        return p.read_text(encoding="utf-8")
+        with open(p, encoding="utf-8") as f:
+            return f.read()
     except Exception:
         return ""
 
 
-def make_rel(a: Path, b: Path):
+def make_rel(a, b):
     try:
-        return os.path.relpath(str(b), start=str(a))
+        return os.path.relpath(b, start=a)
     except Exception:
         return str(b)
 
 
-def gather_logs_for_topology(top_dir: Path):
+def _scan_files(top_dir):
+    """Yield file entries under top_dir, sorted per directory, parents first (like os.walk).
+
+    Unreadable directories are skipped silently, as os.walk does by default.
+    """
+    try:
+        with os.scandir(top_dir) as it:
+            entries = sorted(it, key=lambda e: e.name)
+    except OSError:
+        return
+    subdirs = []
+    for e in entries:
+        try:
+            is_dir = e.is_dir()
+        except OSError:
+            is_dir = False
+        if is_dir:
+            if not e.is_symlink():
+                subdirs.append(e.path)
+        else:
+            yield e
+    for d in subdirs:
+        yield from _scan_files(d)
+
+
+def gather_logs_for_topology(top_dir: str):
     # find relevant text/log files under topology dir, ignore .svg
     files = []
-    for root, _, fnames in os.walk(top_dir):
-        for f in sorted(fnames):
-            if f.endswith(".svg"):
-                continue
-            # skip topology_description.txt (it's shown separately)
-            if f == "topology_description.txt":
-                continue
-            if f.endswith(".log") or f.endswith(".txt") or f.endswith(".md"):
-                files.append(Path(root) / f)
+    for e in _scan_files(top_dir):
+        # skip topology_description.txt (it's shown separately)
+        if e.name in _SKIP_NAMES:
+            continue
+        _, dot, ext = e.name.rpartition(".")
+        if dot and ext in _LOG_SUFFIXES:
+            files.append(e.path)
     return files
 
 
-def gather_root_logs(base: Path):
-    files = []
-    for p in sorted(base.iterdir()):
-        if p.is_file() and not p.name.endswith(".svg"):
-            if p.name == "index.html":
-                continue
-            files.append(p)
+def gather_root_logs(base: str):
+    with os.scandir(base) as it:
+        files = [e.path for e in it
+                 if e.name != "index.html" and not e.name.endswith(".svg") and e.is_file()]
+    files.sort()
     return files
 
 
@@ -227,85 +303,71 @@ def generate_index(base_dir: str):
         print("ERROR: base dir not found:", base)
         return 2
 
+    base_str = str(base)
     index_path = base / "index.html"
-    tops = collect_topologies(base)
-    throughput_md = base / "throughput_latency_loss.md"
-    md_content = ""
-    if throughput_md.exists():
-        md_content = read_text_file(throughput_md)
+    tops = collect_topologies(base_str)
+    # a missing summary reads as empty
+    md_content = read_text_file(os.path.join(base_str, "throughput_latency_loss.md"))
 
     # build topology map for linking
-    topo_map = build_topology_map(tops)
-
-    html_lines = []
-    html_lines.append("<!doctype html>")
-    # ...existing code...
-    html_lines.append(f"<h1>Test results: {html.escape(base.name)}</h1>")
-    html_lines.append("<html lang='en'><head><meta charset='utf-8'>")
-    html_lines.append(
-        "<title>Test results index: {}</title>".format(html.escape(base.name)))
-    html_lines.append("<style>body{font-family:Segoe UI,Arial,Helvetica,sans-serif;margin:20px}h1,h2{color:#003366}"
-                      "pre{background:#f7f7f7;padding:10px;border-radius:4px;overflow:auto}table{border-collapse:col"
-                      "lapse;width:100%}th,td{padding:6px;border:1px solid #ddd;text-align:left}a.small{font-size:0."
-                      "9em;color:#0066cc}</style>")
-    html_lines.append("</head><body>")
-
-    # throughput_md section - render with links to topologies
-    if md_content:
-        try:
-            table_html = render_throughput_table(md_content, topo_map)
-            html_lines.append("<h2>Throughput summary</h2>")
-            html_lines.append(table_html)
-        except Exception:
-            html_lines.append("<pre>")
-            html_lines.append(html.escape(md_content))
-            html_lines.append("</pre>")
-    # Per-topology sections
-    for t in tops:
-        # show topology name with an inline short summary (first non-empty line)
-        desc = ""
-        desc_file = t / "topology_description.txt"
-        if desc_file.exists():
-            desc = read_text_file(desc_file)
-            # extract first non-empty line as short summary
-            for ln in desc.splitlines():
-                s = ln.strip()
-                if s:
-                    break
-        m = re.match(r'^topology-(\d+)$', t.name)
-        if m:
-            num = m.group(1)
-            display_name = f"{num}. topology"
-            anchor_id = t.name  # e.g. "topology-0"
-        else:
-            display_name = t.name
-            anchor_id = t.name
-        html_lines.append(
-            f"<h2 id='{html.escape(anchor_id)}'>{html.escape(display_name)}</h2>")
-        # if full description exists and has more than the short line, show it (no extra heading)
-        html_lines.append("<h3>Description</h3>")
-        if desc:
-            html_lines.append("<pre>{}</pre>".format(html.escape(desc)))
-        # list logs & relevant files
-        files = gather_logs_for_topology(t)
-        if files:
-            html_lines.append("<h3>Files</h3>")
-            html_lines.append(
-                "<table><thead><tr><th>Path</th><th>Type</th></tr></thead><tbody>")
-            for f in files:
-                rel = make_rel(base, f)
-                html_lines.append("<tr><td><a href='{}'>{}</a></td><td>{}</td></tr>".format(
-                    html.escape(rel), html.escape(rel), html.escape(f.suffix.lstrip('.'))))
-            html_lines.append("</tbody></table>")
-        else:
-            html_lines.append(
-                "<p>No log/text files found in this topology (SVGs ignored).</p>")
-
-    # footer
-    html_lines.append("<hr><p>Generated by tools/generate_index.py</p>")
-    html_lines.append("</body></html>")
-
-    index_path.write_text("\n".join(html_lines), encoding="utf-8")
+    topo_map, topo_meta = build_topology_map(tops)
+
+    # build the whole page in memory so a failure part-way leaves the previous index intact
+    with io.StringIO() as out:
+        out.write("<!doctype html>\n")
+        # ...existing code...
+        out.write(f"<h1>Test results: {base.name.translate(_HTML_ESCAPE_TABLE)}</h1>\n")
+        out.write("<html lang='en'><head><meta charset='utf-8'>\n")
+        out.write(f"<title>Test results index: {base.name.translate(_HTML_ESCAPE_TABLE)}</title>\n")
+        out.write("<style>body{font-family:Segoe UI,Arial,Helvetica,sans-serif;margin:20px}h1,h2{color:#003366}"
+                  "pre{background:#f7f7f7;padding:10px;border-radius:4px;overflow:auto}table{border-collapse:col"
+                  "lapse;width:100%}th,td{padding:6px;border:1px solid #ddd;text-align:left}a.small{font-size:0."
+                  "9em;color:#0066cc}</style>\n")
+        out.write("</head><body>\n")
+
+        # throughput_md section - render with links to topologies
+        if md_content:
+            # render into a scratch buffer so a parse failure can fall back to <pre>
+            table_buf = io.StringIO()
+            try:
+                render_throughput_table(md_content, topo_map, table_buf)
+                out.write("<h2>Throughput summary</h2>\n")
+                out.write(table_buf.getvalue())
+            except Exception:
+                out.write("<pre>\n")
+                out.write(md_content.translate(_HTML_ESCAPE_TABLE))
+                out.write("\n</pre>\n")
+        # Per-topology sections
+        for name, top_path, _ in tops:
+            meta = topo_meta[name]
+            desc = meta['desc']
+            display_name = meta['display']
+            anchor_id = name  # e.g. "topology-0"
+            out.write(f"<h2 id='{anchor_id.translate(_HTML_ESCAPE_TABLE)}'>"
+                      f"{display_name.translate(_HTML_ESCAPE_TABLE)}</h2>\n")
+            # if full description exists and has more than the short line, show it (no extra heading)
+            out.write("<h3>Description</h3>\n")
+            if desc:
+                out.write(f"<pre>{desc.translate(_HTML_ESCAPE_TABLE)}</pre>\n")
+            # list logs & relevant files
+            files = gather_logs_for_topology(top_path)
+            if files:
+                out.write("<h3>Files</h3>\n")
+                out.write("<table><thead><tr><th>Path</th><th>Type</th></tr></thead><tbody>\n")
+                for f in files:
+                    rel = make_rel(base_str, f).translate(_HTML_ESCAPE_TABLE)
+                    suffix = os.path.splitext(f)[1].lstrip('.')
+                    out.write(f"<tr><td><a href='{rel}'>{rel}</a></td>"
+                              f"<td>{suffix.translate(_HTML_ESCAPE_TABLE)}</td></tr>\n")
+                out.write("</tbody></table>\n")
+            else:
+                out.write("<p>No log/text files found in this topology (SVGs ignored).</p>\n")
+
+        # footer
+        out.write("<hr><p>Generated by tools/generate_index.py</p>\n")
+        out.write("</body></html>\n")
+
+        index_path.write_text(out.getvalue(), encoding="utf-8")
     print("Wrote", index_path)
     return 0
 
@@ -2,17 +2,31 @@
 '''
 Websocket client/server
 
-python3 -m pip install websockets netifaces -i https://pypi.tuna.tsinghua.edu.cn/simple
+python3 -m pip install websockets -i https://pypi.tuna.tsinghua.edu.cn/simple
+
+The server runs on asyncio; it uses uvloop when installed (python3 -m pip install uvloop).
 
 '''
+import asyncio
+import fcntl
+import functools
+import socket
+import struct
 import time
 import logging
 import signal
 import sys
 import argparse
-import netifaces
+import websockets
 from websockets.sync.client import connect
-from websockets.sync.server import serve
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+# ioctl request to read an interface's IPv4 address (linux/sockios.h)
+SIOCGIFADDR = 0x8915
 
 class WebSocketClient:
     """Simple synchronous websocket client using websockets.sync.client."""
@@ -42,25 +56,48 @@ class WebSocketClient:
 
 
 class WebSocketServer:
-    """Simple synchronous websocket server using websockets.sync.server."""
+    """Asyncio websocket echo server; all connections share one event loop."""
     def __init__(self, bind_host: str, port: int):
         self.host = bind_host
         self.port = port
 
-    def _echo_handler(self, websocket):
-        """Echo back received messages."""
+    async def _echo_handler(self, websocket):
+        """Echo back received messages as-is (text stays text, binary stays binary)."""
         try:
-            for message in websocket:
+            async for message in websocket:
                 logging.info("Received: %s", message)
-                websocket.send(message)
+                await websocket.send(message)
         except Exception as e:
             logging.error("Connection error: %s", e)
 
+    async def _serve(self):
+        # echo payloads are relayed untouched: no permessage-deflate, no frame size cap
+        async with websockets.serve(self._echo_handler, self.host, self.port,
+                                    compression=None, max_size=None):
+            await asyncio.Future()  # run forever
+
     def start(self):
         """Start the server and block until interrupted."""
         logging.info("Starting server on ws://%s:%s", self.host, self.port)
-        with serve(self._echo_handler, self.host, self.port) as srv:
-            srv.serve_forever()
+        uvloop_run = getattr(uvloop, "run", None)  # uvloop.run needs uvloop >= 0.18
+        if uvloop_run is not None:
+            uvloop_run(self._serve())
+        else:
+            if uvloop is not None:
+                uvloop.install()
+            asyncio.run(self._serve())
+
+
+@functools.lru_cache(maxsize=None)
+def get_ipv4_address(ifname: str):
+    """Return the IPv4 address of ifname, or None if it has none."""
+    ifreq = struct.pack('256s', ifname[:15].encode())
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            return socket.inet_ntoa(fcntl.ioctl(s.fileno(), SIOCGIFADDR, ifreq)[20:24])
+    except OSError:
+        return None
+
 
 def signal_handler(sig, frame):
     logging.info("Interrupt received, stopping...")
@@ -81,9 +118,9 @@ if __name__ == '__main__':
         # read bond interface
         host = 'localhost'
         if args.interface:
-            addrs = netifaces.ifaddresses(args.interface)
-            if netifaces.AF_INET in addrs:
-                host = addrs[netifaces.AF_INET][0]['addr']
+            addr = get_ipv4_address(args.interface)
+            if addr:
+                host = addr
             else:
                 logging.error("No IPv4 address found for interface %s, using localhost", args.interface)
         logging.info("Starting WebSocket server on interface %s with host %s", args.interface, host)